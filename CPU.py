@@ -26,9 +26,14 @@ Registers:
 
 Data storage:
  * Program storage
-   Programs are stored as a list of bit strings
+   Programs arrive from the Compiler as packed binary records, and are
+   unpacked once at load time into three parallel integer arrays (opcodes,
+   operand1s, operand2s) for execution. The bit-string form is kept only to
+   show in the instruction register.
  * Data storage
-   Data is stored as a list of integers (for convenience)
+   Data is stored as a flat list of integers (for convenience), indexed
+   directly by operand. 32768 - 65533 hold variables, and 65534 - 65535 hold
+   the AC and ECX registers. Constants never touch memory.
  * Obviously, these would be combined memory in a real PC. This implementation
    was just far more simple than dealing with start/end registers to delimit
    code and data storage.
@@ -36,13 +41,14 @@ Data storage:
 Instruction format:
  * Instructions are stored as <opcode><operand1><operand2>. Opcodes are four
    bits, and operands are sixteen each.
- * Available operations are MOV, ADD, SUB, MUL, DIV, and JUMP
+ * Available operations are MOV, ADD, SUB, MUL, DIV, JUMP, and ADDTO
  * An operation > opcode table is available in the Compiler module.
 
 Limitations:
  * Cannot handle negative numbers. Makes sense because the programming language
    does not allow direct instantiation of negative numbers. Subtract operations
    will behave incorrectly when operand2 > operand1.
+ * Division is integer division; remainders are discarded.
  * Can only handle constants < 32768. Higher numbers are references to variables
    or registers.
 
@@ -51,8 +57,14 @@ Usage:
 """
 
 import os
+from array import array
 
-from Compiler import Compiler
+from Compiler import Compiler, instruction
+
+
+# Data memory addresses of the registers.
+AC = 65534
+ECX = 65535
 
 
 class CPU:
@@ -66,43 +78,88 @@ class CPU:
         """
         self.comp = Compiler(code, debug)
         
-        # Load program memory with the bytecode.
+        # Load program memory with the printable bytecode.
         self.prog_memory = str(self.comp).split("\n")
 
-        # Create an empty space for data memory.
-        self.data_memory = []
+        # Unpack every instruction once, up front, into parallel arrays of
+        # opcodes and operands.
+        ops, o1, o2 = zip(*instruction.iter_unpack(self.comp.bytecode))
+        self.ops = array("B", ops)
+        self.o1 = array("H", o1)
+        self.o2 = array("H", o2)
+
+        # Create a zeroed data memory, which also holds the AC and ECX
+        # registers at their operand addresses.
+        self.mem = [0] * 65536
 
-        # Initialize registers.
-        self.ac = 0   # Accumulator
-        self.ecx = 0  # Loop count
+        # Initialize the remaining registers.
         self.pc = 0   # Program counter
         self.ir = 0   # Instruction register
 
         # Set debug flag for this instance.
         self.debug = debug
 
+        # Methods which execute each opcode, indexed by opcode.
+        self._dispatch = (
+            self.mov,   # 0
+            self.add,   # 1
+            self.sub,   # 2
+            self.mul,   # 3
+            self.div,   # 4
+            self.jump,  # 5
+            self.addto  # 6
+        )
+
+    @property
+    def ac(self):
+        """Accumulator, stored at its register address in data memory."""
+        return self.mem[AC]
+
+    @property
+    def ecx(self):
+        """Loop count, stored at its register address in data memory."""
+        return self.mem[ECX]
+
+    @property
+    def data_memory(self):
+        """Values of the program's variables, in order of declaration."""
+        return self.mem[32768:32768 + len(self.comp.variables)]
+
     def __str__(self):
         """Returns string representation of the CPU, i.e. the register
            values.
         """
-        return "### REGISTERS ###\n" + \
-               "AC =  " + str(self.ac) + "\n" + \
-               "ECX = " + str(self.ecx) + "\n" + \
-               "PC =  " + str(self.pc) + "\n" + \
-               "IR =  " + str(self.ir) + "\n" + \
-               "### DATA MEMORY ###\n" + "\n".join([str(x) for x in self.data_memory])
+        return ("### REGISTERS ###\n"
+                "AC =  %s\n"
+                "ECX = %s\n"
+                "PC =  %s\n"
+                "IR =  %s\n"
+                "### DATA MEMORY ###\n%s") % (self.ac, self.ecx, self.pc, self.ir,
+                                              "\n".join(map(str, self.data_memory)))
     
     def start(self):
-        """Initiates the fetch-execute cycle."""
-        while self.pc < len(self.prog_memory):
-            print(self)
+        """Initiates the fetch-execute cycle. Without debugging, the program
+           runs in a single tight loop; with it, the state before each cycle
+           is recorded and written out, followed by the final state.
+        """
+        if not self.debug:
+            self.pc = _run(self.ops, self.o1, self.o2, self.mem, self.pc)
+            if self.pc > 0:
+                self.ir = self.prog_memory[self.pc - 1]
+            return
+
+        self.trace = []
+        record = self.trace.append
+        end = len(self.prog_memory)
+        while self.pc < end:
+            record(str(self))
             self.fetch()
             self.execute()
+        record(str(self))
 
-        if self.debug:
-            self.out = open(os.path.join(os.getcwd(), "cpu_output.txt"), "w")
-            self.out.write(self.__str__())
-            self.out.close()
+        self.out = open(os.path.join(os.getcwd(), "cpu_output.txt"), "w")
+        self.out.write("\n".join(self.trace))
+        self.out.close()
 
     def fetch(self):
         """Fetches an instruction from 'memory' and place it in the
@@ -111,86 +168,100 @@ class CPU:
         self.ir = self.prog_memory[self.pc]
 
     def execute(self):
-        """Executes the instruction currently in the instruction register."""
-        operation = self.ir[:4]
-        operand1 = self.ir[4:20]
-        operand2 = self.ir[20:]
-
-        if operation == "0000":
-            self.mov(operand1, operand2)
-        elif operation == "0001":
-            self.add(operand1, operand2)
-        elif operation == "0010":
-            self.sub(operand1, operand2)
-        elif operation == "0011":
-            self.mul(operand1, operand2)
-        elif operation == "0100":
-            self.div(operand1, operand2)
-        else:
-            if self.ecx > 0:
-                self.jump(operand1)
-                return  # Skip incrementing 1.
-
-        self.pc += 1
+        """Executes the instruction currently in the instruction register,
+           using its pre-decoded form.
+        """
+        pc = self.pc
+        self.pc = pc + 1  # A taken jump overwrites this.
+        self._dispatch[self.ops[pc]](self.o1[pc], self.o2[pc])
 
     def mov(self, operand1, operand2):
         """Moves data from operand2 to operand1."""
-        ident = int(operand1, 2)
-
-        # If the destination is a variable.
-        if ident < 65534:
-            index = ident - 32768
-            if len(self.data_memory) < index + 1:
-                self.data_memory.append(self.get_data(operand2))
-            else:
-                self.data_memory[index] = self.get_data(operand2)
-        # If the destination is the accumulator.
-        elif ident == 65534:
-            self.ac = self.get_data(operand2)
-        # If the destination is the loop register.
-        else:
-            self.ecx = self.get_data(operand2)
+        self._store(operand1, self._load(operand2))
 
     def add(self, operand1, operand2):
         """Adds data from operand2 to operand1."""
-        self.mov(operand1, self.get_data(operand1) + self.get_data(operand2))
+        value1 = self._load(operand1)
+        value2 = self._load(operand2)
+        self._store(operand1, value1 + value2)
 
     def sub(self, operand1, operand2):
         """Subtracts data in operand2 from operand1."""
-        self.mov(operand1, self.get_data(operand1) - self.get_data(operand2))
+        value1 = self._load(operand1)
+        value2 = self._load(operand2)
+        self._store(operand1, value1 - value2)
 
     def mul(self, operand1, operand2):
         """Multiplies data in operand1 by operand2."""
-        self.mov(operand1, self.get_data(operand1) * self.get_data(operand2))
+        value1 = self._load(operand1)
+        value2 = self._load(operand2)
+        self._store(operand1, value1 * value2)
 
     def div(self, operand1, operand2):
-        """Divides data in operand1 by operand2."""
-        self.mov(operand1, self.get_data(operand1) / self.get_data(operand2))
+        """Divides data in operand1 by operand2, discarding any remainder."""
+        value1 = self._load(operand1)
+        value2 = self._load(operand2)
+        self._store(operand1, value1 // value2)
+
+    def addto(self, operand1, operand2):
+        """Adds data from operand2 to the variable operand1, and leaves the
+           sum in the accumulator.
+        """
+        value = self.mem[operand1] + self._load(operand2)
+        self.mem[operand1] = value
+        self.mem[AC] = value
 
-    def jump(self, operand):
-        """Jumps to the line specified by operand1."""
-        self.pc = int(operand, 2)
+    def jump(self, operand1, operand2):
+        """Jumps to the line specified by operand1 if the loop register is
+           nonzero. operand2 is unused.
+        """
+        if self.mem[ECX] > 0:
+            self.pc = operand1
         
-    def get_data(self, operand):
+    def _load(self, operand):
         """Takes a data identifier and determines whether it refers to a
            register or a variable or is simply a constant. Returns the value
            of whichever it is.
         """
-        # If the operand hasn't been converted to an int, do so.
-        if type(operand) == str:
-            ident = int(operand, 2)
-        else:
-            ident = operand
-            
-        if ident < 32768:
-            return ident
-        elif ident < 65534:
-            return self.data_memory[ident - 32768]
-        elif ident == 65534:
-            return self.ac
-        else:
-            return self.ecx
-        
+        return operand if operand < 32768 else self.mem[operand]
+
+    def _store(self, operand, value):
+        """Stores a value in the register or variable the data identifier
+           refers to.
+        """
+        self.mem[operand] = value
+
+
+def _run(ops, o1, o2, mem, pc):
+    """Runs the decoded program from pc to completion against the given data
+       memory, and returns the final program counter. This is the CPU's
+       execute logic inlined into one loop over plain integers.
+    """
+    end = len(ops)
+    while pc < end:
+        operation = ops[pc]
+        dest = o1[pc]
+        source = o2[pc]
+        value = source if source < 32768 else mem[source]
+        pc += 1  # A taken jump overwrites this.
+
+        if operation == 0:
+            mem[dest] = value
+        elif operation == 1:
+            mem[dest] = mem[dest] + value
+        elif operation == 2:
+            mem[dest] = mem[dest] - value
+        elif operation == 3:
+            mem[dest] = mem[dest] * value
+        elif operation == 4:
+            mem[dest] = mem[dest] // value
+        elif operation == 6:
+            mem[dest] = mem[AC] = mem[dest] + value
+        elif mem[ECX] > 0:
+            pc = dest
+
+    return pc
+
 if __name__ == "__main__":
     # Run some test code.
     prog_path = os.path.join(os.getcwd(), "program.dat")
@@ -3,6 +3,10 @@
 This module compiles the simple assembly instructions described below into
 bytecode executable by the CPU module.
 
+Bytecode is held as packed five-byte records: a one-byte opcode followed by
+two big-endian sixteen-bit operands. The bit-string layout below is the
+printable form produced by str() and written to the debug output.
+
 ### Program Storage Format ###
 Opcode    Operand1            Operand2
 XXXX      XXXXXXXXXXXXXXXX    XXXXXXXXXXXXXXXX
@@ -17,34 +21,43 @@ MOV    0000    Moves data of second operand into first operand
 ADD    0001    Adds data of second operand into first operand
 SUB    0010    Subtracts data of second operand from first operand
 MUL    0011    Multiplies data of first operand by second operand
-DIV    0100    Divides data of first operand by second operand
+DIV    0100    Divides data of first operand by second operand (integer)
 
 JMP    0101    Jumps to position of first (only) operand if ECX register == 0
 
+ADDTO  0110    Adds data of second operand into first operand, a variable, and
+               leaves the sum in AC. The compiler emits it in place of the
+               sequence MOV AC a; ADD AC b; MOV a AC.
+
 ### Register Codes ###
 AC     1111111111111110    (65534)
 ECX    1111111111111111    (65535)
 """
 
 import os
+import struct
 
 from Assembler import Assembler
 
 
 operators = {
-    "MOV": "0000",
-    "ADD": "0001",
-    "SUB": "0010",
-    "MUL": "0011",
-    "DIV": "0100",
-    "JMP": "0101"
+    "MOV": 0,
+    "ADD": 1,
+    "SUB": 2,
+    "MUL": 3,
+    "DIV": 4,
+    "JMP": 5,
+    "ADDTO": 6
 }
 
 registers = {
-    "AC": "1111111111111110",
-    "ECX": "1111111111111111"
+    "AC": 65534,
+    "ECX": 65535
 }
 
+# Packed layout of a single instruction: opcode, operand1, operand2.
+instruction = struct.Struct(">BHH")
+
 
 class Compiler:
     """Reads assembly code as defined by Assembler and converts it to bytecode
@@ -56,91 +69,105 @@ class Compiler:
            code to bytecode.
         """
         self.variables = {}
+        self.next_variable = 2**15  # Address of the next new variable.
         assembly = str(Assembler(code, debug))
         self.bytecode = self.comp(assembly)
 
         # If debugging is enabled, set it up.
         if debug:
             self.out = open(os.path.join(os.getcwd(), "compiler_output.txt"), "w")
-            self.out.write(self.bytecode)
+            self.out.write(str(self))
             self.out.close()
 
     def __str__(self):
-        """Returns the string representation of the compiled bytecode."""
-        return self.bytecode
+        """Returns the string representation of the compiled bytecode, one
+           bit-string instruction per line.
+        """
+        return "\n".join([dec_to_bin(op, 4) + dec_to_bin(operand1, 16) +
+                          dec_to_bin(operand2, 16) for op, operand1, operand2
+                          in instruction.iter_unpack(self.bytecode)])
 
     def comp(self, assembly):
         """Takes assembly code and returns bytecode representation."""
-        bytecode = ""
+        # Bind lookups used on every line to locals.
+        ops = operators
+        regs = registers
+        variable = self.variable
+        pack = instruction.pack
+
+        bytecode = bytearray()
         instr_count = 0
         label = 0
-        for line in assembly.strip().split("\n"):
-            parts = line.split()
+        lines = [line.split() for line in assembly.strip().split("\n")]
+        for parts in fuse(lines):
             operator = parts[0]
 
             if operator.startswith("label"):
                 label = instr_count
                 continue  # i.e. don't increment the instruction counter
             elif operator == "JMP":
-                bytecode += operators[operator]
-
                 # Jump to previously-set label. Doesn't matter what the
-                # label is, because nested loops aren't allowed.
-                bytecode += dec_to_bin(label, 16)
-
-                # Add empty operand.
-                bytecode += dec_to_bin(0, 16)
+                # label is, because nested loops aren't allowed. The second
+                # operand is empty.
+                bytecode += pack(ops[operator], label, 0)
             else:
-                # Add operator to the bytecode.
-                bytecode += operators[operator]
-
-                # Add operand1 to the bytecode.
+                # Look up operand1.
                 operand1 = parts[1]
-                if operand1 in registers.keys():
-                    bytecode += registers[operand1]
+                if operand1 in regs:
+                    operand1 = regs[operand1]
                 else:
-                    bytecode += self.variable(operand1)
-                    
-                # Add operand2 to the bytecode.
+                    operand1 = variable(operand1)
+
+                # Look up operand2.
                 operand2 = parts[2]
                 try:
                     # Only works if it's a constant.
-                    bytecode += dec_to_bin(int(operand2), 16)
+                    operand2 = int(operand2)
                 except:
                     # Must be a variable or register.
-                    if operand2 in registers.keys():
-                        bytecode += registers[operand2]
+                    if operand2 in regs:
+                        operand2 = regs[operand2]
                     else:
-                        bytecode += self.variable(operand2)
+                        operand2 = variable(operand2)
+
+                bytecode += pack(ops[operator], operand1, operand2)
 
-            bytecode += "\n"
             instr_count += 1
 
-        return bytecode.strip()  # Strip removes the trailing newline.
+        return bytes(bytecode)
 
     def variable(self, var):
-        """Takes a variable name. If it already has a binary representation,
-           return that. Otherwise, assign a binary representation, and return
-           it.
+        """Takes a variable name. If it already has an address, return that.
+           Otherwise, assign an address, and return it.
         """
-        if len(self.variables) == 0:
-            self.variables[var] = 2**15
-        elif var not in self.variables.keys():
-            self.variables[var] = max(self.variables.values()) + 1
+        if var not in self.variables:
+            self.variables[var] = self.next_variable
+            self.next_variable += 1
+
+        return self.variables[var]
 
-        return dec_to_bin(self.variables[var], 16)
+def fuse(lines):
+    """Takes assembly lines, each split into its parts, and returns them with
+       every MOV AC a; ADD AC b; MOV a AC sequence, where a is a variable,
+       replaced by the single instruction ADDTO a b.
+    """
+    fused = []
+    i = 0
+    while i < len(lines):
+        first, second, third = (lines[i:i + 3] + [[], []])[:3]
+        if (first[:2] == ["MOV", "AC"] and first[2] not in registers and
+                second[:2] == ["ADD", "AC"] and third == ["MOV", first[2], "AC"]):
+            fused.append(["ADDTO", first[2], second[2]])
+            i += 3
+        else:
+            fused.append(first)
+            i += 1
+
+    return fused
 
 def dec_to_bin(decimal, length):
     """Accepts a decimal integer and returns a string representation of the
        equivalent binary. If the binary representaiton is longer than length,
        return the oversized string without resizing.
     """
-    string = ""
-    while decimal > 0:
-        string = str(decimal % 2) + string
-        decimal /= 2
-
-    if len(string) < length:
-        return ("0" * (length - len(string))) + string
-    
-    return string
+    return format(decimal, "0%db" % length)
@@ -5,13 +5,31 @@ generates a table of tokens to be assembled by the Assembler module.
 """
 
 import os
+import re
 
 from TokenCodes import *
 
 
-# Define character lists for type validation.
-numbers = [str(x) for x in range(10)]
-lowercase = [chr(x) for x in range(97, 123)]
+# Map reserved words and operators to their types.
+keywords = {
+    "TO": RESERVED_WORD,
+    "DO": RESERVED_WORD,
+    "END": RESERVED_WORD,
+    ":=": ASSIGN_OP,
+    "+": MATH_OP,
+    "-": MATH_OP,
+    "*": MATH_OP,
+    "/": MATH_OP,
+    ";": SEMICOLON
+}
+
+# Split code into lexemes. Anything not otherwise matched becomes a lexeme of
+# its own, so determine_type can reject it.
+tokens = re.compile(r":=|[;+\-*/]|\w+|\S")
+
+# Define patterns for type validation.
+is_constant = re.compile("[0-9]+").fullmatch
+is_variable = re.compile("[a-z][a-z0-9]*").fullmatch
 
 
 class InvalidLexemeException(Exception):
@@ -38,17 +56,14 @@ class Lex():
         
     def analyze(self, code):
         """Accepts textual form of code and returns it as a list of Lexemes."""
-        # Split the code by whitespace and store each lexeme.
-        for item in code.split():
-            if item.endswith(";"):
-                self.lexemes += [Lexeme(item[:-1]), Lexeme(";")]
-            else:
-                self.lexemes.append(Lexeme(item))
+        self.lexemes = [Lexeme(match.group()) for match in tokens.finditer(code)]
         
 class Lexeme():
     """Represents a lexeme, storing its textual form as well as its Type, per
        the language definition.
     """
+
+    __slots__ = ("text", "type")
     
     def __init__(self, text):
         """Takes the textual form of a lexeme and determines other pertinent
@@ -66,36 +81,13 @@ def determine_type(text):
     """Takes the textual form of a lexeme and returns a textual 
        representation of its type.
     """
-    # The first five conditionals check 
-    if text in ("TO", "DO", "END"):
-        return RESERVED_WORD
-    elif text == ":=":
-        return ASSIGN_OP
-    elif text in ("+", "-", "*", "/"):
-        return MATH_OP
-    elif text == ";":
-        return SEMICOLON
+    if text in keywords:
+        return keywords[text]
+    elif is_constant(text):
+        return CONSTANT
+    elif is_variable(text):
+        return VARIABLE
     else:
-        # Loop through the lexicon text to determine whether it's a valid
-        # constant or variable.
-        if text[0] in lowercase:
-            type = VARIABLE
-        elif text[0] in numbers:
-            type = CONSTANT
-        else:
-            raise InvalidLexemeException(
-                "%s should start with a number or lowercase letter." % (text)
-                )
-        for char in text[1:]:
-            if char in numbers:
-                pass  # Valid in either const or variable.
-            elif char in lowercase:
-                # If a letter's found in what appeared to be a const, throw an
-                # exception. It's not a valid variable or constant.
-                if type == CONSTANT:
-                    raise InvalidLexemeException
-            else:
-                # If something other than a number or lowercase letter appears
-                # throw an exception. 
-                raise InvalidLexemeException
-        return type
+        raise InvalidLexemeException(
+            "%s is not a valid constant or variable." % (text)
+            )